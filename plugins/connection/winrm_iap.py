@@ -13,8 +13,9 @@ DOCUMENTATION = r"""
           remote Windows host's WinRM HTTPS port (5986).
         - The parent WinRM connection then talks to C(localhost:<local_port>)
           instead of the real host, which has no public IP.
-        - Each connection instance gets its own tunnel with an OS-assigned
-          port, so parallel forks work safely.
+        - Tunnels use an OS-assigned local port. By default one tunnel per
+          target is shared by all forks of an Ansible run and torn down when
+          the run exits; see O(iap_tunnel_persist).
     version_added: "1.0.0"
     extends_documentation_fragment:
         - connection_pipelining
@@ -59,6 +60,23 @@ DOCUMENTATION = r"""
         vars:
             - name: ansible_iap_tunnel_timeout
         type: int
+      iap_tunnel_persist:
+        description:
+            - Reuse one IAP tunnel per target for the whole Ansible run instead
+              of starting a new tunnel for every connection.
+            - Tunnel state is kept under C($XDG_RUNTIME_DIR/ansible_iap_tunnels),
+              or C(~/.ansible/tmp/iap) when that is not set, and the tunnel is
+              stopped once the Ansible controller process exits.
+            - A connection reset (for example V(reset_connection) via C(meta), or
+              C(win_reboot)) reuses a shared tunnel while it still accepts
+              connections, and only starts a new one if it has died. Each new
+              WinRM connection still gets a fresh IAP stream to the instance.
+            - Set to V(false) to start and stop a private tunnel for each
+              connection; a reset then always restarts the tunnel.
+        default: true
+        vars:
+            - name: ansible_iap_tunnel_persist
+        type: bool
       remote_addr:
         description:
             - Address of the windows machine.
@@ -172,12 +190,18 @@ all:
           gcp_zone: us-east4-a
 """
 
+import errno
+import fcntl
+import hashlib
+import multiprocessing
 import os
 import re
-import select
+import selectors
 import signal
 import socket
 import subprocess
+import sys
+import time
 import typing as t
 
 from ansible.errors import AnsibleConnectionFailure, AnsibleError
@@ -186,6 +210,127 @@ from ansible.utils.display import Display
 
 display = Display()
 
+_PORT_RE = re.compile(rb'Picking local unused port \[(\d+)\]')
+# gcloud prints this only after its own connection test has passed and the
+# local listener is accepting, so no TCP probe is needed once it is seen.
+_READY_RE = re.compile(rb'Listening on port \[(\d+)\]')
+
+_GCLOUD_BASE = ('gcloud', 'compute', 'start-iap-tunnel')
+# Port 0 lets the OS pick a free local port.
+_GCLOUD_TAIL = ('--local-host-port=localhost:0',)
+
+_STDERR_PIPE_SIZE = 1 << 20
+
+# gcloud only binds the picked port once its own connection test passes
+# (typically 1-3s), then prints the _READY_RE line.  TCP probing is a
+# fallback in case that line never shows up, so it starts this long after
+# the port is picked and retries every _PROBE_INTERVAL seconds.
+_READY_FALLBACK = 2.0
+_PROBE_INTERVAL = 0.1
+
+_TUNNEL_STATE_DIR = os.path.join('~', '.ansible', 'tmp', 'iap')
+
+# Watchdog for a shared tunnel: it inherits the read end of gcloud's stderr
+# and keeps draining it, so gcloud never writes into a closed pipe once the
+# fork that started it exits.  Once the Ansible controller process that owns
+# the tunnel exits, it kills the gcloud process group and removes the state
+# file.
+_TUNNEL_REAPER = r"""
+import os, select, signal, sys, time
+owner, pid, state, fd = int(sys.argv[1]), int(sys.argv[2]), sys.argv[3], int(sys.argv[4])
+def alive(p):
+    try:
+        os.kill(p, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+while alive(pid):
+    if not alive(owner):
+        try:
+            os.killpg(pid, signal.SIGTERM)
+        except OSError:
+            pass
+        try:
+            os.unlink(state)
+        except OSError:
+            pass
+        break
+    if fd < 0:
+        time.sleep(1)
+    elif select.select([fd], [], [], 1.0)[0]:
+        try:
+            if not os.read(fd, 65536):
+                fd = -1
+        except BlockingIOError:
+            pass
+        except OSError:
+            fd = -1
+"""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _port_accepts(port: int) -> bool:
+    try:
+        socket.create_connection(('localhost', port), timeout=1).close()
+    except OSError:
+        return False
+    return True
+
+
+def _tunnel_state_dir() -> str:
+    """Return the shared tunnel state directory, preferring the per-user tmpfs."""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        path = os.path.join(runtime_dir, 'ansible_iap_tunnels')
+    else:
+        path = os.path.expanduser(_TUNNEL_STATE_DIR)
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+
+def _lock_tunnel_state(path: str) -> int:
+    """Open and exclusively lock a state file, retrying if it was unlinked meanwhile."""
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.stat(path).st_ino == os.fstat(fd).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+
+def _prune_tunnel_states(state_dir: str) -> None:
+    """Remove state files whose tunnel is no longer running."""
+    for name in os.listdir(state_dir):
+        path = os.path.join(state_dir, name)
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except OSError:
+            continue
+        try:
+            # Entries locked by another fork are being started or reused.
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            state = os.read(fd, 64).split()
+            if len(state) != 2 or not _pid_alive(int(state[0])):
+                os.unlink(path)
+        except (OSError, ValueError):
+            pass
+        finally:
+            os.close(fd)
+
 
 class Connection(WinRMConnection):
     """WinRM connection over a GCP IAP tunnel."""
@@ -197,6 +342,9 @@ class Connection(WinRMConnection):
         super().__init__(*args, **kwargs)
         self._iap_tunnel_proc: subprocess.Popen | None = None
         self._iap_local_port: int | None = None
+        self._iap_tunnel_shared = False
+        self._iap_options: dict[str, t.Any] | None = None
+        self._iap_instance_cache: str | None = None
 
     def _get_iap_instance_name(self) -> str:
         name = self.get_option('gcp_instance_name')
@@ -205,15 +353,30 @@ class Connection(WinRMConnection):
         return self.get_option('remote_addr') or self._play_context.remote_addr
 
     def _start_iap_tunnel(self) -> int:
-        """Start a gcloud IAP tunnel and return the local port."""
+        """Start (or reuse) a gcloud IAP tunnel and return the local port."""
+        if self._iap_tunnel_shared and self._iap_local_port is not None:
+            return self._iap_local_port
         if self._iap_tunnel_proc and self._iap_tunnel_proc.poll() is None:
             return self._iap_local_port
 
-        instance = self._get_iap_instance_name()
-        project = self.get_option('gcp_project')
-        zone = self.get_option('gcp_zone')
-        remote_port = self.get_option('port') or 5986
-        timeout = self.get_option('iap_tunnel_timeout') or 30
+        # Resolve the options once per connection.  _connect() overrides
+        # remote_addr and port with the local tunnel endpoint, so a reconnect
+        # from reset() must not read them again.
+        if self._iap_options is None:
+            self._iap_options = {
+                k: self.get_option(k) for k in (
+                    'gcp_project', 'gcp_zone', 'port', 'iap_tunnel_timeout',
+                    'gcp_iap_service_account', 'iap_tunnel_persist',
+                )
+            }
+        opts = self._iap_options
+        self._iap_instance_cache = self._iap_instance_cache or self._get_iap_instance_name()
+
+        instance = self._iap_instance_cache
+        project = opts['gcp_project']
+        zone = opts['gcp_zone']
+        remote_port = opts['port'] or 5986
+        timeout = opts['iap_tunnel_timeout'] or 30
 
         if not project:
             raise AnsibleError("gcp_project is required for winrm_iap connection")
@@ -221,111 +384,244 @@ class Connection(WinRMConnection):
             raise AnsibleError("gcp_zone is required for winrm_iap connection")
 
         cmd = [
-            'gcloud', 'compute', 'start-iap-tunnel',
-            instance, str(remote_port),
-            '--local-host-port=localhost:0',
+            *_GCLOUD_BASE, instance, str(remote_port), *_GCLOUD_TAIL,
             '--zone', zone,
             '--project', project,
         ]
 
-        sa = self.get_option('gcp_iap_service_account')
+        sa = opts['gcp_iap_service_account']
         if sa:
             cmd.extend(['--impersonate-service-account', sa])
 
+        if not opts['iap_tunnel_persist']:
+            return self._spawn_iap_tunnel(cmd, instance, remote_port, timeout)
+
+        # Share one tunnel per target between all forks of the same Ansible
+        # run.  The state files form a cross-process table: each holds
+        # "<pid> <port>" of a live tunnel and its lock serialises startup, so
+        # concurrent forks wait for the first one and then reuse its tunnel.
+        parent = multiprocessing.parent_process()
+        owner = parent.pid if parent else os.getpid()
+        key = hashlib.sha1(
+            ('%d/%s/%s/%s/%s/%s' % (owner, project, zone, instance, remote_port, sa or '')).encode()
+        ).hexdigest()
+        state_dir = _tunnel_state_dir()
+        state_path = os.path.join(state_dir, key)
+
+        fd = _lock_tunnel_state(state_path)
+        try:
+            state = os.read(fd, 64).split()
+            if len(state) == 2:
+                pid, port = int(state[0]), int(state[1])
+                if _pid_alive(pid) and _port_accepts(port):
+                    display.vvv(
+                        "WINRM_IAP: reusing tunnel (pid=%d) on localhost:%d -> %s:%s"
+                        % (pid, port, instance, remote_port),
+                        host=instance,
+                    )
+                    self._iap_local_port = port
+                    self._iap_tunnel_shared = True
+                    return port
+
+            _prune_tunnel_states(state_dir)
+            port = self._spawn_iap_tunnel(cmd, instance, remote_port, timeout)
+            pid = self._iap_tunnel_proc.pid
+            stderr_fd = self._iap_tunnel_proc.stderr.fileno()
+            subprocess.Popen(
+                [sys.executable, '-c', _TUNNEL_REAPER, str(owner), str(pid), state_path, str(stderr_fd)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                stdin=subprocess.DEVNULL,
+                pass_fds=(stderr_fd,),
+                start_new_session=True,
+            )
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, b'%d %d\n' % (pid, port), 0)
+            self._iap_tunnel_shared = True
+            return port
+        finally:
+            os.close(fd)
+
+    def _spawn_iap_tunnel(self, cmd: list[str], instance: str, remote_port: int, timeout: int) -> int:
+        """Launch gcloud and wait until the tunnel accepts connections."""
         display.vvv(
             "WINRM_IAP: starting tunnel: %s" % ' '.join(cmd),
             host=instance,
         )
 
+        # Popen uses vfork() here (Python 3.10+ on Linux), so launching gcloud
+        # does not copy the worker's page tables.  Passing preexec_fn, user or
+        # group would fall back to fork(); start_new_session does not.
         self._iap_tunnel_proc = subprocess.Popen(
             cmd,
-            stdout=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
             stderr=subprocess.PIPE,
             stdin=subprocess.DEVNULL,
             start_new_session=True,
         )
 
-        # Wait for the tunnel to report the listening port on stderr, then
-        # poll the port until it accepts connections.
-        port_re = re.compile(r'(?:Listening on port|Picking local unused port) \[(\d+)\]')
-        collected_stderr = []
-        deadline = __import__('time').time() + timeout
-
-        # Phase 1: read stderr until we see the port number.
-        while __import__('time').time() < deadline:
-            if self._iap_tunnel_proc.poll() is not None:
-                remaining = self._iap_tunnel_proc.stderr.read().decode('utf-8', errors='replace')
-                collected_stderr.append(remaining)
-                raise AnsibleConnectionFailure(
-                    "IAP tunnel process exited unexpectedly (rc=%d): %s"
-                    % (self._iap_tunnel_proc.returncode, ''.join(collected_stderr))
-                )
-
-            ready, _, _ = select.select(
-                [self._iap_tunnel_proc.stderr], [], [], 1.0
-            )
-            if ready:
-                line = self._iap_tunnel_proc.stderr.readline().decode(
-                    'utf-8', errors='replace'
-                )
-                if not line:
-                    continue
-                collected_stderr.append(line)
-                display.vvvv("WINRM_IAP tunnel stderr: %s" % line.strip(), host=instance)
-                m = port_re.search(line)
-                if m:
-                    self._iap_local_port = int(m.group(1))
+        # Single event loop: read stderr until gcloud reports that it is
+        # listening.  If it has picked a port but stays quiet past
+        # _READY_FALLBACK, also probe that port with non-blocking connects;
+        # the tunnel is ready once one completes.
+        # stderr is read raw into a buffer and only decoded for messages.
+        stderr_buf = bytearray()
+        deadline = time.monotonic() + timeout
+        stderr_fd = self._iap_tunnel_proc.stderr.fileno()
+        os.set_blocking(stderr_fd, False)
+        # Grow the pipe (Linux only) so a chatty gcloud at -vvvv never
+        # blocks on stderr while we are slow to drain it.
+        if hasattr(fcntl, 'F_SETPIPE_SZ'):
+            try:
+                fcntl.fcntl(stderr_fd, fcntl.F_SETPIPE_SZ, _STDERR_PIPE_SIZE)
+            except OSError:
+                pass
+        sel = selectors.DefaultSelector()
+        sel.register(stderr_fd, selectors.EVENT_READ)
+        sock: socket.socket | None = None
+        next_probe = 0.0
+        ready = False
+
+        try:
+            while not ready:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
                     break
 
-        if self._iap_local_port is None:
-            self._stop_iap_tunnel()
-            raise AnsibleConnectionFailure(
-                "Timed out waiting for IAP tunnel port after %ds. Stderr: %s"
-                % (timeout, ''.join(collected_stderr))
-            )
-
-        # Phase 2: poll until the local port accepts TCP connections.
-        while __import__('time').time() < deadline:
-            if self._iap_tunnel_proc.poll() is not None:
-                raise AnsibleConnectionFailure(
-                    "IAP tunnel died while waiting for port to become ready (rc=%d)"
-                    % self._iap_tunnel_proc.returncode
-                )
-            try:
-                sock = socket.create_connection(('localhost', self._iap_local_port), timeout=1)
+                if self._iap_tunnel_proc.poll() is not None:
+                    if self._iap_local_port is not None:
+                        raise AnsibleConnectionFailure(
+                            "IAP tunnel died while waiting for port to become ready (rc=%d)"
+                            % self._iap_tunnel_proc.returncode
+                        )
+                    try:
+                        chunk = os.read(stderr_fd, 4096)
+                        while chunk:
+                            stderr_buf += chunk
+                            chunk = os.read(stderr_fd, 4096)
+                    except BlockingIOError:
+                        pass
+                    raise AnsibleConnectionFailure(
+                        "IAP tunnel process exited unexpectedly (rc=%d): %s"
+                        % (self._iap_tunnel_proc.returncode, stderr_buf.decode('utf-8', errors='replace'))
+                    )
+
+                wait = min(remaining, 1.0)
+                if self._iap_local_port is not None and sock is None:
+                    now = time.monotonic()
+                    if now >= next_probe:
+                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                        sock.setblocking(False)
+                        rc = sock.connect_ex(('localhost', self._iap_local_port))
+                        if rc == 0:
+                            ready = True
+                            continue
+                        if rc in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                            sel.register(sock, selectors.EVENT_WRITE)
+                        else:
+                            sock.close()
+                            sock = None
+                            next_probe = now + _PROBE_INTERVAL
+                    if sock is None:
+                        # Refused (loopback usually reports it later via
+                        # SO_ERROR): retry after the interval, waking early
+                        # if gcloud has something to say on stderr.
+                        wait = min(wait, max(0.0, next_probe - now))
+
+                for key, _ in sel.select(timeout=wait):
+                    if key.fileobj is sock:
+                        sel.unregister(sock)
+                        if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                            ready = True
+                        else:
+                            next_probe = time.monotonic() + _PROBE_INTERVAL
+                        sock.close()
+                        sock = None
+                        continue
+
+                    try:
+                        chunk = os.read(stderr_fd, 4096)
+                    except BlockingIOError:
+                        continue
+                    if not chunk:
+                        # EOF: gcloud is exiting; reap it so the next poll()
+                        # reports the exit instead of waiting out the select.
+                        sel.unregister(stderr_fd)
+                        try:
+                            self._iap_tunnel_proc.wait(timeout=1.0)
+                        except subprocess.TimeoutExpired:
+                            pass
+                        continue
+                    stderr_buf += chunk
+                    if display.verbosity > 3:
+                        display.vvvv(
+                            "WINRM_IAP tunnel stderr: %s" % chunk.decode('utf-8', errors='replace').strip(),
+                            host=instance,
+                        )
+                    m = _READY_RE.search(stderr_buf)
+                    if m:
+                        self._iap_local_port = int(m.group(1))
+                        ready = True
+                    elif self._iap_local_port is None:
+                        m = _PORT_RE.search(stderr_buf)
+                        if m:
+                            self._iap_local_port = int(m.group(1))
+                            next_probe = time.monotonic() + _READY_FALLBACK
+        finally:
+            if sock is not None:
                 sock.close()
-                display.vvv(
-                    "WINRM_IAP: tunnel ready on localhost:%d -> %s:%s"
-                    % (self._iap_local_port, instance, remote_port),
-                    host=instance,
-                )
-                return self._iap_local_port
-            except OSError:
-                __import__('time').sleep(0.5)
+            sel.close()
+
+        if ready:
+            display.vvv(
+                "WINRM_IAP: tunnel ready on localhost:%d -> %s:%s"
+                % (self._iap_local_port, instance, remote_port),
+                host=instance,
+            )
+            return self._iap_local_port
 
         # Timeout reached
+        port_seen = self._iap_local_port is not None
         self._stop_iap_tunnel()
+        if not port_seen:
+            raise AnsibleConnectionFailure(
+                "Timed out waiting for IAP tunnel port after %ds. Stderr: %s"
+                % (timeout, stderr_buf.decode('utf-8', errors='replace'))
+            )
         raise AnsibleConnectionFailure(
             "Timed out waiting for IAP tunnel after %ds. Stderr: %s"
-            % (timeout, ''.join(collected_stderr))
+            % (timeout, stderr_buf.decode('utf-8', errors='replace'))
         )
 
     def _stop_iap_tunnel(self) -> None:
         """Terminate the IAP tunnel subprocess."""
-        if self._iap_tunnel_proc:
-            display.vvv("WINRM_IAP: stopping tunnel (pid=%d)" % self._iap_tunnel_proc.pid)
+        if self._iap_tunnel_shared:
+            # Other forks may still be using it; the reaper cleans it up
+            # once the Ansible run is over.
+            self._iap_tunnel_proc = None
+            self._iap_local_port = None
+            self._iap_tunnel_shared = False
+        elif self._iap_tunnel_proc:
+            proc = self._iap_tunnel_proc
+            # start_new_session made gcloud a group leader, so its pid is
+            # also the process group id.  Signal the whole group: the leader
+            # may be a wrapper script whose child outlives it.
+            if proc.poll() is None:
+                display.vvv("WINRM_IAP: stopping tunnel (pid=%d)" % proc.pid)
             try:
-                os.killpg(os.getpgid(self._iap_tunnel_proc.pid), signal.SIGTERM)
+                os.killpg(proc.pid, signal.SIGTERM)
             except OSError:
+                # ESRCH: the group is already empty.
                 pass
-            try:
-                self._iap_tunnel_proc.wait(timeout=5)
-            except subprocess.TimeoutExpired:
+            else:
                 try:
-                    os.killpg(os.getpgid(self._iap_tunnel_proc.pid), signal.SIGKILL)
-                except OSError:
-                    pass
-                self._iap_tunnel_proc.wait(timeout=5)
+                    proc.wait(timeout=1.0)
+                except subprocess.TimeoutExpired:
+                    try:
+                        os.killpg(proc.pid, signal.SIGKILL)
+                    except OSError:
+                        pass
+                    proc.wait(timeout=5)
             self._iap_tunnel_proc = None
             self._iap_local_port = None
 
@@ -360,7 +656,11 @@ class Connection(WinRMConnection):
         self.shell_id = None
         self._connected = False
 
-        # Reconnect (will start a new tunnel)
+        # Reconnect.  A private tunnel is restarted; a shared tunnel is only
+        # released and then reused if its listener still accepts, since other
+        # forks may be using it and gcloud opens a new IAP stream per local
+        # connection anyway (e.g. after win_reboot).  A dead shared tunnel is
+        # replaced.
         self._connect()
 
     def close(self) -> None:
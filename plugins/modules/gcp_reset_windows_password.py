@@ -81,9 +81,15 @@ vault_file:
 import json
 import os
 import subprocess
-import tempfile
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.text.converters import to_text
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 
 def run_module():
@@ -126,17 +132,18 @@ def run_module():
         '--quiet',
     ]
 
-    rc, stdout, stderr = module.run_command(cmd)
+    # Keep the output as bytes; both orjson and json parse bytes directly.
+    rc, stdout, stderr = module.run_command(cmd, encoding=None)
     if rc != 0:
         module.fail_json(
-            msg="gcloud reset-windows-password failed (rc=%d): %s" % (rc, stderr),
+            msg="gcloud reset-windows-password failed (rc=%d): %s" % (rc, to_text(stderr)),
             cmd=' '.join(cmd),
         )
 
     try:
-        result = json.loads(stdout)
-    except json.JSONDecodeError:
-        module.fail_json(msg="Failed to parse gcloud output: %s" % stdout)
+        result = _json_loads(stdout)
+    except ValueError:
+        module.fail_json(msg="Failed to parse gcloud output: %s" % to_text(stdout))
 
     username = result.get('username', user)
     password = result.get('password', '')
@@ -156,22 +163,18 @@ def run_module():
 
         yaml_content = "ansible_user: %s\nansible_password: %s\n" % (username, password)
 
-        # Write to a temp file then encrypt in place
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.yml', delete=False, dir=host_dir) as tmp:
-            tmp.write(yaml_content)
-            tmp_path = tmp.name
-
+        # Feed the plaintext on stdin so it never touches the disk;
+        # ansible-vault creates the final file directly (O_EXCL, mode 0600)
+        # and writes only the ciphertext to it.
         encrypt_cmd = [
-            'ansible-vault', 'encrypt', tmp_path,
+            'ansible-vault', 'encrypt',
             '--vault-password-file', vault_password_file,
+            '--output', vault_file,
         ]
-        rc, stdout, stderr = module.run_command(encrypt_cmd)
+        rc, stdout, stderr = module.run_command(encrypt_cmd, data=yaml_content, binary_data=True)
         if rc != 0:
-            os.unlink(tmp_path)
             module.fail_json(msg="ansible-vault encrypt failed: %s" % stderr)
 
-        # Move encrypted file to final location
-        os.rename(tmp_path, vault_file)
         output['vault_file'] = vault_file
 
     module.exit_json(**output)
@@ -72,12 +72,11 @@ mkdir -p "$HOST_DIR"
 
 VAULT_FILE="$HOST_DIR/vault.yml"
 
-cat > "$VAULT_FILE" <<YAML
+# Pipe the plaintext straight into ansible-vault so it never lands on disk
+ansible-vault encrypt --output "$VAULT_FILE" --vault-password-file "$VAULT_PASSWORD_FILE" <<YAML
 ansible_user: $USERNAME
 ansible_password: $PASSWORD
 YAML
 
-ansible-vault encrypt "$VAULT_FILE" --vault-password-file "$VAULT_PASSWORD_FILE"
-
 echo "Credentials written and encrypted: $VAULT_FILE"
 echo "Verify with: ansible-vault view $VAULT_FILE --vault-password-file $VAULT_PASSWORD_FILE"